@@ -0,0 +1,391 @@
+# Shared data loading, aggregation and chart helpers for the dashboard pages
+import streamlit as st
+import pandas as pd
+from pandas.io.parsers import TextParser
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+import gspread
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import glob
+import hashlib
+import io
+import math
+import os
+import tempfile
+import pyarrow
+
+# --- Google Sheets Setup ---
+scope = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
+SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1tZhb4xf2Mb7r0YwH-ow-73KvebzFI6YCoPeHEB3eBVM/edit?usp=sharing"
+
+# Values rendered the same way get_as_dataframe(evaluate_formulas=True) reads them
+SHEET_READ_PARAMS = {
+    "valueRenderOption": "UNFORMATTED_VALUE",
+    "dateTimeRenderOption": "FORMATTED_STRING",
+}
+SHEET_NAMES = ["Leads w Opps", "Campaigns w Leads"]
+# batchGet failures a smaller per-sheet read can get past: the combined response erroring
+# out (500) or exceeding the deadline (504). Quota errors (429) and everything else re-raise
+# rather than fanning out more requests
+BATCH_FALLBACK_STATUS_CODES = {500, 504}
+PARQUET_CACHE_DIR = os.path.join(tempfile.gettempdir(), "lead_dashboard_cache")
+# Part of the cache key; bump whenever values_to_frame or parquet_safe change what gets written
+PARQUET_CACHE_VERSION = 2
+# Anything that can go wrong reading or writing the Parquet cache; the cache is best-effort
+PARQUET_CACHE_ERRORS = (OSError, ValueError, pyarrow.ArrowException)
+
+ordered_months = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+]
+status_order = ["New", "Working", "Disqualified", "Converted", "Reject - never r.."]
+stage_order = [
+    "Discovery", "Qualified", "Evaluation", "Pricing Negotiation",
+    "Legal Negotiation", "Proposal", "Closed Won", "Closed Lost", "Unqualified"
+]
+
+@st.cache_resource
+def get_client():
+    # Shared across sessions so credentials and the HTTP session are reused
+    service_account_info = st.secrets["gcp_service_account"]
+    creds = Credentials.from_service_account_info(service_account_info, scopes=scope)
+
+    # One keep-alive session for every Sheets request instead of a new TLS handshake each
+    session = AuthorizedSession(creds)
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return gspread.Client(auth=creds, session=session)
+
+def values_to_frame(values):
+    # Parsed the same way get_as_dataframe does: rows padded out to a rectangle, then pandas'
+    # TextParser, so its default NA tokens (#N/A, N/A, NULL, ...) become NaN and repeated
+    # headers get .1, .2 suffixes
+    if not values:
+        return pd.DataFrame()
+    width = max(len(row) for row in values)
+    rows = [row + [""] * (width - len(row)) for row in values]
+    df = TextParser(rows, header=0).read().dropna(how='all')
+    # Like get_as_dataframe, drop headerless columns that hold no data
+    df = df.drop(columns=[
+        col for col in df.columns
+        if isinstance(col, str) and col.startswith("Unnamed:") and df[col].isna().all()
+    ])
+    # Arrow-backed dtypes keep string columns compact and use Arrow compute kernels
+    return df.convert_dtypes(dtype_backend="pyarrow")
+
+def parquet_safe(frame):
+    # Parquet needs unique string column names and single-typed columns; blank or repeated
+    # headers and text in numeric columns (e.g. #N/A) would otherwise fail the write
+    names = []
+    for i, col in enumerate(frame.columns):
+        name = f"Unnamed: {i}" if col is None or col == "" else str(col)
+        base, n = name, 0
+        while name in names:
+            n += 1
+            name = f"{base}.{n}"
+        names.append(name)
+    frame = frame.set_axis(names, axis=1)
+    mixed = frame.columns[frame.dtypes == object]
+    return frame.astype({col: "string" for col in mixed})
+
+def parquet_cache_paths(raw_last_update):
+    # One file per sheet, keyed by the sheet's refresh time and the cache format version
+    key = hashlib.sha1(f"{PARQUET_CACHE_VERSION}:{raw_last_update}".encode()).hexdigest()[:12]
+    return [
+        os.path.join(PARQUET_CACHE_DIR, f"lead_cache_{key}_{i}.parquet")
+        for i in range(len(SHEET_NAMES))
+    ]
+
+def read_parquet_cache(paths):
+    # None on a miss or an unreadable file, so the caller fetches from Sheets instead
+    try:
+        return [pd.read_parquet(path, dtype_backend="pyarrow") for path in paths]
+    except PARQUET_CACHE_ERRORS:
+        return None
+
+def write_parquet_cache(frames, paths):
+    # Clear files from earlier refreshes, then write each file under a unique temp name and
+    # rename it into place, so concurrent workers never see or clobber partial files
+    try:
+        os.makedirs(PARQUET_CACHE_DIR, exist_ok=True)
+        for stale in glob.glob(os.path.join(PARQUET_CACHE_DIR, "*.parquet")):
+            if stale not in paths:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass  # another worker already removed it
+        for frame, path in zip(frames, paths):
+            with tempfile.NamedTemporaryFile(dir=PARQUET_CACHE_DIR, suffix=".tmp", delete=False) as tmp:
+                tmp_path = tmp.name
+            try:
+                frame.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    except PARQUET_CACHE_ERRORS:
+        pass  # the frames just fetched are still used; the next cold load retries the cache
+
+def fetch_sheet_frames(spreadsheet):
+    # One batchGet round trip for every sheet; if the combined response fails, read the sheets
+    # concurrently (one thread per sheet) so wall time is the slowest sheet, not the sum
+    ranges = [f"'{name}'" for name in SHEET_NAMES]
+    try:
+        value_ranges = spreadsheet.values_batch_get(ranges, params=SHEET_READ_PARAMS)["valueRanges"]
+    except gspread.exceptions.APIError as e:
+        if e.response.status_code not in BATCH_FALLBACK_STATUS_CODES:
+            raise
+        with ThreadPoolExecutor(max_workers=len(ranges)) as ex:
+            value_ranges = list(ex.map(lambda r: spreadsheet.values_get(r, params=SHEET_READ_PARAMS), ranges))
+    return [values_to_frame(r.get("values", [])) for r in value_ranges]
+
+@st.cache_data(ttl=600, show_spinner="Loading sheets…")
+def load_data():
+    # --- Open Google Sheet ---
+    spreadsheet = get_client().open_by_url(SPREADSHEET_URL)
+
+    # --- Last Update ---
+    log = spreadsheet.values_get("'Auto Refresh Execution Log'!A2", params=SHEET_READ_PARAMS)
+    raw_last_update = log["values"][0][0]
+    parsed_dt = datetime.strptime(raw_last_update, "%m/%d/%Y %H:%M:%S")
+    formatted_last_update = parsed_dt.strftime("Last Updated: %m/%d/%Y %I:%M %p")
+
+    # --- Load DataFrames ---
+    # Parquet files from this refresh survive worker restarts; otherwise fetch the sheets
+    paths = parquet_cache_paths(raw_last_update)
+    frames = read_parquet_cache(paths)
+    if frames is None:
+        frames = [parquet_safe(frame) for frame in fetch_sheet_frames(spreadsheet)]
+        write_parquet_cache(frames, paths)
+    leads_w_opps, campaigns_w_leads = frames
+    # Plain float64: coercing an Arrow string column leaves NaN (not null) that sum() would keep
+    leads_w_opps["ARR Delta (converted)"] = pd.to_numeric(leads_w_opps["ARR Delta (converted)"], errors="coerce").astype("float64")
+
+    # Only the lead -> campaign pairs are used downstream
+    campaigns_w_leads = campaigns_w_leads[["Lead 18-Digit ID", "Campaign Name"]].dropna().drop_duplicates()
+
+    # Low-cardinality columns as categoricals for cheaper filters and groupbys
+    for col in ["Lead Owner", "ZI Sub-Industry", "Segment", "Lead Source"]:
+        leads_w_opps[col] = leads_w_opps[col].astype("category")
+    # Status and stage are only ever reported in these orders, so group output comes out sorted
+    leads_w_opps["Lead Status"] = pd.Categorical(leads_w_opps["Lead Status"], categories=status_order, ordered=True)
+    leads_w_opps["Stage"] = pd.Categorical(leads_w_opps["Stage"], categories=stage_order, ordered=True)
+
+    # Clean Dates
+    leads_w_opps["Created Date"] = pd.to_datetime(leads_w_opps["Created Date"], errors="coerce")
+    leads_w_opps["Converted Date"] = pd.to_datetime(leads_w_opps["Converted Date"], errors="coerce")
+    # Ordered month categorical built from the month numbers, not a per-row strftime;
+    # groupbys on it come out in calendar order
+    month_num = leads_w_opps["Created Date"].dt.month
+    leads_w_opps["Created Month"] = pd.Categorical.from_codes(
+        month_num.fillna(0).astype("int8") - 1, categories=ordered_months, ordered=True
+    )
+
+    # Is Qualified
+    leads_w_opps["Is Qualified"] = pd.Categorical(
+        np.where(leads_w_opps["Qualified Date"].notna(), "Qualified", "Not Qualified"),
+        categories=["Not Qualified", "Qualified"]
+    )
+
+    # Classification
+    seg = leads_w_opps["Segment"]
+    is_smb = seg.isin(["Mid Market", "Mass Market"])
+    is_ent = seg == "Enterprise"
+    leads_w_opps["Account Classification"] = np.where(is_smb, "SMB", np.where(is_ent, "ENT", "Unclassified"))
+    leads_w_opps["Account Classification"] = leads_w_opps["Account Classification"].astype("category")
+
+    # Tag frames with the sheet refresh time (to the second, same key as the Parquet cache)
+    # so filtered aggregations can key on it
+    leads_w_opps.attrs["version"] = raw_last_update
+    campaigns_w_leads.attrs["version"] = raw_last_update
+
+    return leads_w_opps, campaigns_w_leads, formatted_last_update
+
+# --- Filtered Aggregations ---
+# Cached per filter state; loaded frames hash by their refresh timestamp instead of contents
+FRAME_HASH = {pd.DataFrame: lambda d: d.attrs["version"]}
+
+def count_unique_leads(df, group_col, sort=True):
+    # Distinct lead IDs per group: dedupe (group, lead) pairs, then a plain row count.
+    # observed=True keeps categorical groupbys to the categories actually present
+    pairs = df[[group_col, "Lead 18-Digit ID"]].dropna().drop_duplicates()
+    return pairs.groupby(group_col, observed=True, sort=sort).size()
+
+def apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification):
+    # Combine filters into one mask and index once; downstream code is read-only
+    mask = np.ones(len(leads_w_opps), dtype=bool)
+    if lead_owner != "All":
+        mask &= (leads_w_opps["Lead Owner"].values == lead_owner)
+    if sub_industry != "All":
+        mask &= (leads_w_opps["ZI Sub-Industry"].values == sub_industry)
+    if month != "All":
+        mask &= (leads_w_opps["Created Month"].values == month)
+    if classification != "All":
+        mask &= (leads_w_opps["Account Classification"].values == classification)
+    df = leads_w_opps.loc[mask] if not mask.all() else leads_w_opps
+    return df
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_kpis(leads_w_opps, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    # Count straight off boolean arrays rather than materializing filtered frames
+    n = len(df)
+    stage = df["Stage"].values
+    has_opp = df["Opportunity: Created Date"].notna().to_numpy()
+    total_leads = df["Lead 18-Digit ID"].nunique()
+    convert_to_opp_pct = 100.0 * np.count_nonzero(has_opp) / n if n else 0
+    closed_won_count = np.count_nonzero(stage == "Closed Won")
+    total_opps = df["Opportunity Name"].nunique(dropna=True)
+    closed_won_rate = (closed_won_count / total_opps * 100) if total_opps > 0 else 0
+    return total_leads, convert_to_opp_pct, closed_won_rate
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_monthly(leads_w_opps, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    monthly = count_unique_leads(df, "Created Month")
+    # Plain labels, otherwise seaborn lays out every month category on the x axis
+    monthly.index = monthly.index.astype(str)
+    return monthly
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_top_sources(leads_w_opps, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    return (
+        count_unique_leads(df, "Lead Source", sort=False)
+        .nlargest(5)
+    )
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_top_campaigns(leads_w_opps, campaigns_w_leads, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    merged = df[["Lead 18-Digit ID"]].merge(campaigns_w_leads, on="Lead 18-Digit ID", how="inner")
+    return (
+        count_unique_leads(merged, "Campaign Name", sort=False)
+        .nlargest(10)
+        .reset_index(name="Lead Count")
+    )
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_qualified_counts(leads_w_opps, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    return count_unique_leads(df, "Is Qualified")
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_status_counts(leads_w_opps, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    return count_unique_leads(df, "Lead Status")
+
+@st.cache_data(ttl=600, hash_funcs=FRAME_HASH)
+def compute_stage_table(leads_w_opps, lead_owner, sub_industry, month, classification):
+    df = apply_filters(leads_w_opps, lead_owner, sub_industry, month, classification)
+    return (
+        df.groupby("Stage", observed=True)
+        .agg({
+            "ARR Delta (converted)": "sum",
+            "Lead 18-Digit ID": "nunique"
+        })
+        .rename(columns={"Lead 18-Digit ID": "Lead Count"})
+        .reset_index()  # <--- This line adds the Stage column back as a column
+    )
+
+# --- Chart Rendering ---
+# Charts are cached as PNG bytes keyed on the data they plot, so repeat views skip matplotlib
+def fig_to_png(fig):
+    # Same savefig settings st.pyplot uses
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=200)
+    plt.close(fig)
+    return buf.getvalue()
+
+@st.cache_data(ttl=600)
+def render_monthly_chart(monthly):
+    fig1, ax1 = plt.subplots(figsize=(6, 3))
+
+    sns.lineplot(x=monthly.index, y=monthly.values, marker='o', ax=ax1)
+
+    # Dynamic label positioning and smaller font
+    for i, v in enumerate(monthly.values):
+        offset = (max(monthly.values) * 0.05) if len(monthly) > 0 else 1
+        ax1.text(i, v + offset, str(int(v)), ha='center', fontsize=8)
+
+    # Fix Y axis limits so it matches bar chart height (avoid dynamic shrink)
+    max_y = max(monthly.values) if len(monthly) > 0 else 1
+    ax1.set_ylim(0, max_y * 1.3)  # add buffer so labels don't get cut off
+
+    ax1.set_ylabel("Lead Count")
+    ax1.grid(True)
+    plt.tight_layout()
+
+    return fig_to_png(fig1)
+
+@st.cache_data(ttl=600)
+def render_top_sources_chart(top_sources):
+    fig2, ax2 = plt.subplots(figsize=(6, 3))
+
+    # Plot horizontal bar chart
+    top_sources[::-1].plot(kind="barh", color="#2ecc71", ax=ax2)
+
+    # Add labels at the end of each bar
+    for i, v in enumerate(top_sources[::-1].values):
+        ax2.text(
+            v + (max(top_sources.values) * 0.02),
+            i,
+            str(int(v)),
+            va="center",
+            fontsize=9
+        )
+
+    # Define x-axis limit
+    max_x = max(top_sources.values) if len(top_sources) > 0 else 1
+    ax2.set_xlim(0, max_x * 1.2)
+
+    # Calculate a rounded step (to 1, 10, 100, 1000, etc.)
+    raw_step = (max_x * 1.2) / 5
+    magnitude = 10 ** (len(str(int(raw_step))) - 1)
+    step = math.ceil(raw_step / magnitude) * magnitude  # Round up to nearest clean number
+
+    # Set ticks in clean order (0, step, step*2, etc.)
+    ax2.set_xticks(range(0, int(max_x * 1.2) + step, step))
+    ax2.xaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f"{int(x)}"))
+
+    # Clean up chart
+    ax2.set_xlabel("")
+    ax2.set_ylabel("")
+    ax2.grid(axis="x", linestyle="--", alpha=0.7)
+    plt.tight_layout()
+
+    return fig_to_png(fig2)
+
+@st.cache_data(ttl=600)
+def render_qualified_chart(qualified_counts):
+    # Create smaller figure
+    fig3, ax3 = plt.subplots(figsize=(2, 2))
+
+    # Draw pie chart with labels
+    wedges, texts, autotexts = ax3.pie(
+        qualified_counts,
+        labels=qualified_counts.index,   # <-- add labels back
+        autopct=lambda p: f'{p:.1f}%\n({int(p * sum(qualified_counts) / 100)})',
+        startangle=90,
+        textprops={'fontsize': 8}        # sets base fontsize
+    )
+
+    # Adjust percentage/autotext font size
+    for autotext in autotexts:
+        autotext.set_fontsize(7)
+
+    # Adjust label (Qualified/Not Qualified) font size
+    for text in texts:
+        text.set_fontsize(8)
+
+    ax3.set_ylabel("")
+    plt.tight_layout(pad=0.1)
+
+    return fig_to_png(fig3)
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from dashboard_lib import values_to_frame
+
+get_as_dataframe = pytest.importorskip("gspread_dataframe").get_as_dataframe
+
+
+def fake_worksheet(values):
+    # Just enough of a gspread Worksheet for get_as_dataframe to read `values`
+    spreadsheet = SimpleNamespace(values_get=lambda *args, **kwargs: {"values": values})
+    return SimpleNamespace(
+        title="Leads w Opps",
+        spreadsheet=spreadsheet,
+        row_count=len(values),
+        col_count=max(len(row) for row in values),
+    )
+
+
+def test_values_to_frame_matches_get_as_dataframe():
+    values = [
+        ["Lead 18-Digit ID", "Qualified Date", "Opportunity Name", "ARR Delta (converted)", "Stage", "Stage"],
+        ["00Q1", "1/5/2025", "Opp A", 1200, "Discovery", "x"],
+        ["00Q2", "#N/A", "#N/A", "N/A", "", "y"],
+        ["00Q3", "", "Opp B", 300.5],
+        [],
+        ["00Q4", "NULL", "Opp A", "", "Closed Won"],
+    ]
+    expected = get_as_dataframe(fake_worksheet(values), evaluate_formulas=True)
+
+    pd.testing.assert_frame_equal(
+        values_to_frame(values),
+        expected.convert_dtypes(dtype_backend="pyarrow"),
+    )